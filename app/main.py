@@ -4,12 +4,10 @@ import threading
 from utils.llm_utils import (
     classify_query_dynamic,
     generate_research_plan,
-    generate_detailed_report,
     general_response,
 )
 from utils.web_search import perform_deep_research
-from utils.stock_utils import fetch_stock_data
-from utils.vector_db import add_texts
+from utils.report_store import load_report
 
 st.set_page_config(page_title="Financial Research Agent", layout="wide")
 st.title("💹 Financial & Sector Research Agent")
@@ -43,7 +41,9 @@ if user_query:
             response_text = general_response(user_query)
             st.session_state.chat_history.append({"role": "assistant", "content": response_text})
         else:
-            research_plan = generate_research_plan(user_query)
+            # Reuse the stored plan so a refresh keeps the same report sections
+            cached_report = load_report(user_query)
+            research_plan = cached_report["plan"] if cached_report else generate_research_plan(user_query)
             st.session_state.pending_research = {"query": user_query, "plan": research_plan}
 
             st.session_state.chat_history.append({
@@ -58,16 +58,11 @@ if st.session_state.pending_research:
         if st.button("✅ Yes, proceed"):
             with st.spinner("Conducting deep research... 🔎"):
                 query = st.session_state.pending_research["query"]
-                relevant_texts, urls = perform_deep_research(query)
-                stock_data = fetch_stock_data(query)
-                if stock_data:
-                    relevant_texts.append(stock_data)
-
-                add_texts(relevant_texts, metadatas={"query": query})
-                report = generate_detailed_report(relevant_texts, query)
+                report, urls, status = perform_deep_research(query, st.session_state.pending_research["plan"])
 
                 final_response = f"**Research Plan:**\n{st.session_state.pending_research['plan']}\n\n"
                 final_response += f"**Detailed Report:**\n{report}\n\n"
+                final_response += f"**Refresh:** {status}\n\n"
                 final_response += "**Sources:**\n" + "\n".join(urls) if urls else "Sources: Web search and APIs"
 
                 st.session_state.chat_history.append({"role": "assistant", "content": final_response})
@@ -1,7 +1,7 @@
 # background_fetcher.py
 import time
 from utils.web_search import web_search
-from utils.pdf_utils import fetch_pdf_text
+from utils.pdf_utils import fetch_pdf_sources
 from utils.stock_utils import fetch_stock_data
 from utils.vector_db import add_texts
 
@@ -12,7 +12,7 @@ def background_research_loop(interval=3600):
         for query in TRACKED_QUERIES:
             try:
                 search_results, urls = web_search(query, num_results=30)
-                pdf_texts = fetch_pdf_text(urls)
+                pdf_texts = [source["text"] for source in fetch_pdf_sources(urls)]
                 api_text = fetch_stock_data(query)
                 all_texts = search_results + pdf_texts + [api_text]
                 add_texts(all_texts, metadatas={"query": query})
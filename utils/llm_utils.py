@@ -1,5 +1,10 @@
 # llm_utils.py
 import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -17,6 +22,17 @@ llm = ChatGoogleGenerativeAI(
     api_key=GOOGLE_API_KEY
 )
 
+# Map-reduce report configuration
+MAX_SINGLE_PASS_CHARS = 30000  # above this, the report is built with map-reduce
+MAP_CHUNK_CHARS = 12000        # max evidence characters per map (summary) call
+MAP_MAX_WORKERS = 4            # concurrent map calls
+SUMMARY_CACHE_SIZE = 512       # partial summaries kept in memory (least recently used evicted)
+GENERAL_TOPIC = "General findings"
+
+# Partial summaries keyed by evidence hash, shared across reports (LRU-bounded)
+_summary_cache = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
 # Classify user query
 def classify_query_dynamic(query):
     prompt = f"""
@@ -44,20 +60,199 @@ def generate_research_plan(query):
     ])
     return response.content.strip()
 
-# Summarize research results from Vector DB
-# def summarize_research_results(texts, query):
+# ---------------------------------------------------------
+# Map-reduce helpers for large evidence sets
+# ---------------------------------------------------------
+def _evidence_hash(texts, focus=""):
+    digest = hashlib.sha256(focus.encode("utf-8"))
+    for t in texts:
+        digest.update(b"\x1f")
+        digest.update(t.encode("utf-8"))
+    return digest.hexdigest()
+
+def _keywords(text):
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 3}
+
+def _plan_topics(plan):
+    """
+    Extract the bullet points of a research plan as sub-topics.
+    """
+    topics = []
+    for line in (plan or "").splitlines():
+        match = re.match(r"^\s*(?:[-*•]|\d+[.)])\s+(.*)$", line)
+        if match:
+            topic = match.group(1).replace("**", "").strip()
+            if topic:
+                topics.append(topic)
+    return topics
+
+def cluster_evidence(texts, plan=None, max_chars=MAP_CHUNK_CHARS):
+    """
+    Split evidence into clusters for the map step.
+    Each source text (or max_chars slice of a long one) is assigned to the
+    research plan sub-topic it shares the most keywords with (or a general
+    bucket) and forms its own cluster, so its cache key depends only on its
+    content. Pieces are ordered by hash within a topic, making the result
+    independent of retrieval order; duplicate pieces are dropped.
+    Returns a list of (topic, [text]) tuples.
+    """
+    seen = set()
+    pieces = []
+    for t in texts:
+        for start in range(0, len(t), max_chars):
+            piece = t[start:start + max_chars]
+            key = _evidence_hash([piece])
+            if key not in seen:
+                seen.add(key)
+                pieces.append((key, piece))
+
+    topics = _plan_topics(plan)
+    topic_keywords = [(topic, _keywords(topic)) for topic in topics]
+    grouped = {topic: [] for topic in topics}
+    grouped[GENERAL_TOPIC] = []
+
+    for key, piece in pieces:
+        piece_keywords = _keywords(piece)
+        best_topic, best_score = GENERAL_TOPIC, 0
+        for topic, keywords in topic_keywords:
+            score = len(piece_keywords & keywords)
+            if score > best_score:
+                best_topic, best_score = topic, score
+        grouped[best_topic].append((key, piece))
+
+    clusters = []
+    for topic, topic_pieces in grouped.items():
+        clusters += [(topic, [piece]) for _, piece in sorted(topic_pieces)]
+    return clusters
+
+def _cache_summary(key, summary):
+    # caller holds _summary_cache_lock
+    _summary_cache[key] = summary
+    _summary_cache.move_to_end(key)
+    while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+
+def summarize_evidence_cluster(topic, texts, generated=None):
+    """
+    Map step: condense one evidence cluster into a partial summary.
+    Results are cached by evidence hash so overlapping reports reuse them;
+    keys of summaries that needed an LLM call are added to generated if given.
+    """
+    key = _evidence_hash(texts, topic)
+    with _summary_cache_lock:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            return _summary_cache[key]
+
+    context = "\n".join(texts)
+    prompt = f"""
+    Summarise the evidence below with a focus on: "{topic}".
+
+    Guidelines:
+    - Keep every concrete figure, metric, date, company and source name.
+    - Note trends, risks and opportunities stated or implied by the evidence.
+    - Use concise bullet points; do not add facts that are not in the evidence.
+
+    Evidence:
+    {context}
+    """
+    response = llm.invoke([
+        SystemMessage(content="You are a financial research assistant condensing evidence for a larger report."),
+        HumanMessage(content=prompt)
+    ])
+    summary = response.content.strip()
+
+    with _summary_cache_lock:
+        _cache_summary(key, summary)
+    if generated is not None:
+        generated.add(key)
+    return summary
+
+def prime_summary_cache(summaries):
+    """
+    Seed the partial summary cache, e.g. with sections of a stored report.
+    """
+    with _summary_cache_lock:
+        for key, summary in summaries.items():
+            _cache_summary(key, summary)
+
+def _summarize_clusters(clusters, sections=None, generated=None):
+    with ThreadPoolExecutor(max_workers=min(MAP_MAX_WORKERS, len(clusters))) as executor:
+        summaries = list(executor.map(lambda c: summarize_evidence_cluster(*c, generated=generated), clusters))
+
+    if sections is not None:
+        for (topic, batch), summary in zip(clusters, summaries):
+            sections[_evidence_hash(batch, topic)] = summary
+    return summaries
+
+def _group_by_topic(clusters, summaries):
+    by_topic = {}
+    for (topic, _), summary in zip(clusters, summaries):
+        by_topic.setdefault(topic, []).append(summary)
+    return by_topic
+
+def _format_topics(by_topic):
+    return "\n\n".join(f"### {topic}\n" + "\n".join(parts) for topic, parts in by_topic.items())
+
+def _pack(texts, max_chars):
+    batches, batch, size = [], [], 0
+    for t in texts:
+        if batch and size + len(t) > max_chars:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(t)
+        size += len(t)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def map_evidence(texts, query, plan=None, sections=None, generated=None):
+    """
+    Summarise evidence clusters concurrently and return the partial
+    summaries combined under their sub-topic headings.
+    While the combined summaries exceed MAX_SINGLE_PASS_CHARS, each topic's
+    summaries are packed into batches and summarised again.
+    If a sections dict is given, it receives the summaries used, keyed by evidence hash;
+    a generated set receives the keys of summaries that were not cached.
+    """
+    clusters = cluster_evidence(texts, plan=plan)
+    if not clusters:
+        return ""
+    # Without a plan the general bucket is focused on the query itself
+    clusters = [(query if topic == GENERAL_TOPIC and not plan else topic, batch) for topic, batch in clusters]
+
+    by_topic = _group_by_topic(clusters, _summarize_clusters(clusters, sections, generated))
+
+    while len(_format_topics(by_topic)) > MAX_SINGLE_PASS_CHARS:
+        batches = [(topic, batch) for topic, parts in by_topic.items() for batch in _pack(parts, MAP_CHUNK_CHARS)]
+        if all(len(batch) == 1 for _, batch in batches):
+            # nothing left to merge; each summary is already bounded by the map prompt
+            break
+        by_topic = _group_by_topic(batches, _summarize_clusters(batches, sections, generated))
+
+    return _format_topics(by_topic)
+
 # ---------------------------------------------------------
 # Generate a detailed deep research report
 # ---------------------------------------------------------
-def generate_detailed_report(texts, query):
+def generate_detailed_report(texts, query, plan=None, map_reduce=None, sections=None, generated=None):
     """
     Generate a **comprehensive financial research report** for the user.
     This is NOT for educational purposes, but rather a professional-level
     deep research response.
     Do not include any disclaimers or educational content.
     Do not include any date or prepared for prepared by rather it should look like a professional report or long summary.
+    With map_reduce (default: automatic when the context exceeds
+    MAX_SINGLE_PASS_CHARS), evidence clusters grouped by the research plan's
+    sub-topics are summarised concurrently and the final call synthesises them;
+    the partial summaries used are collected into sections, and the keys of
+    those that needed an LLM call into generated, if given.
     """
     context = "\n".join(texts)
+    if map_reduce is None:
+        map_reduce = len(context) > MAX_SINGLE_PASS_CHARS
+    if map_reduce:
+        context = map_evidence(texts, query, plan=plan, sections=sections, generated=generated)
     prompt = f"""
     You are a senior financial research analyst tasked with producing a 
     **comprehensive and professional research report** for the query: "{query}".
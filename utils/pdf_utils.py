@@ -1,5 +1,6 @@
 # utils/pdf_utils.py
 import os
+import json
 import time
 import shutil
 import requests
@@ -14,12 +15,16 @@ from urllib3.util.retry import Retry
 import pdfplumber
 from PyPDF2 import PdfReader
 
+from utils.report_store import text_hash, make_evidence
+
 # Configuration
 DOWNLOAD_DIR = Path("downloaded_pdfs")
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 MAX_PDF_BYTES = 50 * 1024 * 1024  # 50 MB max download
 HEAD_TIMEOUT = 10
 GET_TIMEOUT = 20
+FETCH_STATE_FILE = DOWNLOAD_DIR / "fetch_state.json"
+FETCH_STATE_MAX_AGE = 24 * 60 * 60  # re-check sources without ETag/Last-Modified after a day
 
 # Create a session with retries for transient network errors
 def create_session(total_retries=3, backoff_factor=1):
@@ -71,22 +76,36 @@ def _is_pdf_content_type(headers) -> bool:
     ct = headers.get("content-type", "").lower()
     return "pdf" in ct
 
+def _looks_like_pdf_url(url: str) -> bool:
+    # quick filter: only attempt when likely a PDF (extension or 'pdf'/'download' token)
+    lower = url.lower()
+    return lower.endswith(".pdf") or "pdf" in lower or "download" in lower
+
+def _head_headers(url: str, verify_ssl: bool = True, head_timeout: int = HEAD_TIMEOUT):
+    """
+    HEAD the URL and return its headers, or None if the request failed.
+    """
+    try:
+        head = session.head(url, allow_redirects=True, timeout=head_timeout, verify=certifi.where() if verify_ssl else False)
+        return head.headers or {}
+    except Exception:
+        return None
+
 def download_pdf_to_disk(url: str,
                          download_dir: Path = DOWNLOAD_DIR,
                          max_bytes: int = MAX_PDF_BYTES,
                          verify_ssl: bool = True,
                          head_timeout: int = HEAD_TIMEOUT,
-                         get_timeout: int = GET_TIMEOUT) -> Path | None:
+                         get_timeout: int = GET_TIMEOUT,
+                         headers=None) -> Path | None:
     """
     Download URL to disk if it's a PDF (or appears to be). Returns filepath or None.
+    Pass headers from an earlier HEAD request to skip sending another one.
     """
     try:
         # Try HEAD first to check content-type and size (some servers block HEAD; we handle exceptions)
-        try:
-            head = session.head(url, allow_redirects=True, timeout=head_timeout, verify=certifi.where() if verify_ssl else False)
-            headers = head.headers or {}
-        except Exception:
-            headers = {}
+        if headers is None:
+            headers = _head_headers(url, verify_ssl=verify_ssl, head_timeout=head_timeout) or {}
 
         # If HEAD says not pdf and URL doesn't look like pdf, still try GET if URL contains 'pdf' or 'download'
         looks_like_pdf = url.lower().endswith(".pdf") or "file=" in url.lower() or "pdf" in url.lower() or _is_pdf_content_type(headers)
@@ -203,6 +222,16 @@ def extract_text_from_pdf_file(file_path: Path) -> str:
         print(f"PyPDF2 fallback failed for {file_path}: {e}")
         return ""
 
+def _download_pdf_text(url, headers, **download_kwargs):
+    """
+    Download one PDF and extract its text. Returns (file_path, text);
+    file_path is None if the download failed, text may be empty.
+    """
+    file_path = download_pdf_to_disk(url, headers=headers, **download_kwargs)
+    if not file_path:
+        return None, ""
+    return file_path, extract_text_from_pdf_file(file_path)
+
 def fetch_pdf_text(urls,
                    download_dir: Path = DOWNLOAD_DIR,
                    max_bytes: int = MAX_PDF_BYTES,
@@ -221,26 +250,20 @@ def fetch_pdf_text(urls,
     failed_urls = []
 
     for url in urls:
-        # quick filter: only attempt when likely a PDF (extension or 'pdf' token)
-        try_download = url.lower().endswith(".pdf") or "pdf" in url.lower() or "download" in url.lower()
-        if not try_download:
+        headers = None
+        if not _looks_like_pdf_url(url):
             # Optionally: perform a HEAD to check content-type (avoid many HEADs if you have many urls)
-            try:
-                head = session.head(url, allow_redirects=True, timeout=head_timeout, verify=certifi.where() if verify_ssl else False)
-                if not _is_pdf_content_type(head.headers):
-                    # skip non-pdf url
-                    continue
-            except Exception:
-                # if HEAD fails, we skip to avoid over-requesting
+            headers = _head_headers(url, verify_ssl=verify_ssl, head_timeout=head_timeout)
+            if not headers or not _is_pdf_content_type(headers):
+                # skip non-pdf url (or HEAD failed; we skip to avoid over-requesting)
                 continue
 
-        file_path = download_pdf_to_disk(url, download_dir=download_dir, max_bytes=max_bytes, verify_ssl=verify_ssl, head_timeout=head_timeout, get_timeout=get_timeout)
+        file_path, text = _download_pdf_text(url, headers, download_dir=download_dir, max_bytes=max_bytes, verify_ssl=verify_ssl, head_timeout=head_timeout, get_timeout=get_timeout)
         if not file_path:
             failed_urls.append(url)
             continue
 
         succeeded_files.append(str(file_path))
-        text = extract_text_from_pdf_file(file_path)
         if text:
             pdf_texts.append(text)
         else:
@@ -255,3 +278,106 @@ def fetch_pdf_text(urls,
             print(" -", u)
 
     return pdf_texts, succeeded_files, failed_urls
+
+
+# -------------------------------
+# Persistent fetch state
+# -------------------------------
+def load_fetch_state(path: Path = FETCH_STATE_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_fetch_state(state: dict, path: Path = FETCH_STATE_FILE) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    tmp.replace(path)
+
+def _source_unchanged(entry: dict, headers) -> bool:
+    # Prefer HTTP validators; fall back to the age of the last check
+    etag = headers.get("etag")
+    if etag and entry.get("etag"):
+        return etag == entry["etag"]
+    last_modified = headers.get("last-modified")
+    if last_modified and entry.get("last_modified"):
+        return last_modified == entry["last_modified"]
+    return time.time() - entry.get("checked_at", 0) < FETCH_STATE_MAX_AGE
+
+def _read_cached_text(entry: dict) -> str | None:
+    text_file = entry.get("text_file")
+    if text_file and Path(text_file).exists():
+        return Path(text_file).read_text(encoding="utf-8")
+    return None
+
+def fetch_pdf_sources(urls,
+                      download_dir: Path = DOWNLOAD_DIR,
+                      max_bytes: int = MAX_PDF_BYTES,
+                      verify_ssl: bool = True,
+                      head_timeout: int = HEAD_TIMEOUT,
+                      get_timeout: int = GET_TIMEOUT):
+    """
+    Incremental counterpart of fetch_pdf_text backed by the persistent fetch state.
+    Only new or changed PDFs (by ETag / Last-Modified, or once FETCH_STATE_MAX_AGE
+    has passed when the server sends neither) are downloaded; unchanged ones reuse
+    the stored text, and known non-PDF URLs and recently failed downloads are
+    skipped without a request until FETCH_STATE_MAX_AGE has passed.
+    Returns a list of evidence dicts ({"id": url, "hash", "text"}), one per PDF with text.
+    """
+    state = load_fetch_state()
+    sources = []
+    downloaded = reused = failed = 0
+
+    for url in urls:
+        entry = state.get(url, {})
+        if entry.get("pdf") is False and time.time() - entry.get("checked_at", 0) < FETCH_STATE_MAX_AGE:
+            continue
+        if time.time() - entry.get("failed_at", 0) < FETCH_STATE_MAX_AGE:
+            # failed recently; serve the last good copy (if any) without re-downloading
+            text = _read_cached_text(entry) if entry.get("pdf") else None
+            if text:
+                sources.append(make_evidence(url, text))
+                reused += 1
+            continue
+
+        headers = _head_headers(url, verify_ssl=verify_ssl, head_timeout=head_timeout) or {}
+
+        if entry.get("pdf") and _source_unchanged(entry, headers):
+            text = _read_cached_text(entry)
+            if text:
+                sources.append(make_evidence(url, text))
+                reused += 1
+                continue
+
+        if not (_looks_like_pdf_url(url) or _is_pdf_content_type(headers)):
+            state[url] = {"pdf": False, "checked_at": time.time()}
+            continue
+
+        _, text = _download_pdf_text(url, headers, download_dir=download_dir, max_bytes=max_bytes, verify_ssl=verify_ssl, head_timeout=head_timeout, get_timeout=get_timeout)
+        if not text:
+            # not a PDF, download failed or no text: remember it so refreshes skip it,
+            # and keep serving the last good copy if there is one
+            state[url] = dict(entry, failed_at=time.time())
+            failed += 1
+            cached = _read_cached_text(entry) if entry.get("pdf") else None
+            if cached:
+                sources.append(make_evidence(url, cached))
+            continue
+
+        text_file = download_dir / f"{text_hash(url)[:16]}.txt"
+        text_file.write_text(text, encoding="utf-8")
+        state[url] = {
+            "pdf": True,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "text_file": str(text_file),
+            "checked_at": time.time(),
+        }
+        sources.append(make_evidence(url, text))
+        downloaded += 1
+
+    save_fetch_state(state)
+    print(f"PDF fetch summary: downloaded {downloaded}, reused {reused} from fetch state, failed {failed}")
+    return sources
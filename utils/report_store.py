@@ -0,0 +1,60 @@
+# report_store.py
+import json
+import time
+import hashlib
+from pathlib import Path
+
+# Configuration
+REPORT_DIR = Path("report_cache")
+REPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def make_evidence(evidence_id, text):
+    """
+    Wrap a piece of evidence with a stable ID (URL or source tag) and its content hash.
+    """
+    return {"id": evidence_id, "hash": text_hash(text), "text": text}
+
+def evidence_map(evidence):
+    return {e["id"]: e["hash"] for e in evidence}
+
+def _report_path(query):
+    # Normalise case and whitespace so trivially different queries share a report
+    key = text_hash(" ".join(query.lower().split()))[:32]
+    return REPORT_DIR / f"{key}.json"
+
+def load_report(query):
+    """
+    Return the stored report record for query, or None if there is none.
+    """
+    try:
+        with open(_report_path(query), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_report(query, record):
+    """
+    Persist a report record: plan, evidence IDs/hashes, section summaries,
+    report text and source URLs.
+    """
+    record = dict(record, query=query, updated_at=time.time())
+    path = _report_path(query)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    tmp.replace(path)
+
+def changed_evidence(record, evidence):
+    """
+    Compare current evidence against a stored report record.
+    Returns (changed_ids, removed_ids): new or modified evidence, and evidence
+    the stored report used that is no longer present.
+    """
+    previous = (record or {}).get("evidence", {})
+    current = evidence_map(evidence)
+    changed = [i for i, h in current.items() if previous.get(i) != h]
+    removed = [i for i in previous if i not in current]
+    return changed, removed
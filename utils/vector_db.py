@@ -4,6 +4,7 @@ from langchain_core.embeddings import Embeddings
 import os
 from dotenv import load_dotenv
 from utils.embeddings import get_embeddings
+from utils.report_store import text_hash
 
 load_dotenv()
 
@@ -19,6 +20,10 @@ embeddings = GoogleEmbeddings()
 # Initialize vector_db as None, will be created on first use
 vector_db = None
 
+# Embeddings of texts already indexed, keyed by content hash, so repeated
+# research runs skip re-embedding them and can rank a given set of texts
+_embedding_cache = {}
+
 def add_texts(texts, metadatas=None):
     global vector_db
     if metadatas is not None and not isinstance(metadatas, list):
@@ -26,14 +31,45 @@ def add_texts(texts, metadatas=None):
         metadatas = [metadatas] * len(texts)
     elif metadatas is None:
         metadatas = [{}] * len(texts)
-    
+
+    seen = set()
+    new_texts, new_metadatas, new_hashes = [], [], []
+    for text, metadata in zip(texts, metadatas):
+        h = text_hash(text)
+        if h not in _embedding_cache and h not in seen:
+            new_texts.append(text)
+            new_metadatas.append(dict(metadata, hash=h))
+            new_hashes.append(h)
+            seen.add(h)
+    if not new_texts:
+        return
+
+    vectors = embeddings.embed_documents(new_texts)
+    text_embeddings = list(zip(new_texts, vectors))
     if vector_db is None:
         # Create vector_db with the first batch of texts
-        vector_db = FAISS.from_texts(texts, embedding=embeddings, metadatas=metadatas)
+        vector_db = FAISS.from_embeddings(text_embeddings, embedding=embeddings, metadatas=new_metadatas)
     else:
-        vector_db.add_texts(texts, metadatas=metadatas)
+        vector_db.add_embeddings(text_embeddings, metadatas=new_metadatas)
+    _embedding_cache.update(zip(new_hashes, vectors))
 
 def similarity_search(query, k=5):
     if vector_db is None:
         return []
     return [doc.page_content for doc in vector_db.similarity_search(query, k=k)]
+
+def similarity_search_texts(query, texts, k=5):
+    """
+    Rank only the given texts against query (by L2 distance, like the FAISS index),
+    ignoring anything else the process-wide index holds. Texts are embedded on demand.
+    """
+    if not texts:
+        return []
+    add_texts(texts)
+    query_vector = embeddings.embed_query(query)
+    distances = [
+        sum((a - b) ** 2 for a, b in zip(_embedding_cache[text_hash(t)], query_vector))
+        for t in texts
+    ]
+    ranked = sorted(range(len(texts)), key=lambda i: distances[i])
+    return [texts[i] for i in ranked[:k]]
@@ -1,8 +1,22 @@
 # utils/web_search.py
 import requests
 from ddgs import DDGS
-from utils.pdf_utils import fetch_pdf_text
-from utils.vector_db import add_texts, similarity_search
+from utils.pdf_utils import fetch_pdf_sources
+from utils.report_store import (
+    load_report,
+    save_report,
+    make_evidence,
+    evidence_map,
+    changed_evidence,
+    text_hash,
+)
+from utils.vector_db import add_texts, similarity_search_texts
+from utils.stock_utils import fetch_stock_data
+from utils.llm_utils import generate_detailed_report, prime_summary_cache
+
+# A refresh that finds fewer than this share of the stored report's sources is
+# treated as a failed search (DuckDuckGo errors yield empty results), not removals
+MIN_EVIDENCE_RATIO = 0.5
 
 # -------------------------------
 # Helper: Flatten and clean texts
@@ -42,45 +56,131 @@ def duckduckgo_search(query, max_results=20):
 # Guaranteed Web Search
 # -------------------------------
 def web_search(query, min_urls=15, num_results=25):
-    urls = set()
+    # urls keeps result order so results_text[i] is the snippet of urls[i]
+    seen = set()
+    urls = []
     results_text = []
 
     while len(urls) < min_urls:
         snippets, new_urls = duckduckgo_search(query, max_results=num_results)
         for snippet, url in zip(snippets, new_urls):
-            if url and url not in urls:
-                urls.add(url)
+            if url and url not in seen:
+                seen.add(url)
+                urls.append(url)
                 results_text.append(snippet)
 
         if len(new_urls) == 0:
             break
 
-    return results_text, list(urls)
+    return results_text, urls
 
 # -------------------------------
-# Perform Full Deep Research
+# Collect Evidence
 # -------------------------------
-def perform_deep_research(query):
+def collect_evidence(query):
+    """
+    Gather search snippets and PDF texts for query as evidence dicts
+    ({"id", "hash", "text"}). PDFs go through the persistent fetch state,
+    so only new or changed documents are downloaded.
+    Returns (evidence, all_urls).
+    """
     # 1️⃣ Normal web search
     search_results, urls = web_search(query, min_urls=15)
 
     # 2️⃣ Extra PDF search
     _, pdf_urls = web_search(f"{query} filetype:pdf", min_urls=5)
-    all_urls = list(set(urls + pdf_urls))
+    all_urls = list(dict.fromkeys(urls + pdf_urls))
+
+    # 3️⃣ Snippets keyed by their result URL
+    evidence = []
+    for snippet, url in zip(search_results, urls):
+        cleaned = flatten_and_clean_texts([snippet])
+        if cleaned:
+            evidence.append(make_evidence(f"snippet:{url}", cleaned[0]))
 
-    # 3️⃣ Fetch PDF text
-    pdf_texts = fetch_pdf_text(all_urls)
+    # 4️⃣ Fetch new or changed PDF text
+    evidence += fetch_pdf_sources(all_urls)
 
-    # 4️⃣ Combine all text and clean
-    all_texts = list(search_results) + list(pdf_texts)
-    all_texts = flatten_and_clean_texts(all_texts)
+    return evidence, all_urls
+
+# -------------------------------
+# Retrieve Relevant Evidence
+# -------------------------------
+def retrieve_relevant_texts(query, evidence, k=10):
+    all_texts = flatten_and_clean_texts([e["text"] for e in evidence])
 
     if not all_texts:
         print("[Warning] No valid text found for embedding. Returning empty results.")
-        return [], all_urls
+        return []
 
-    # 5️⃣ Store in vector DB and retrieve relevant results
+    # Store in vector DB (already indexed texts are skipped) and rank only the
+    # current evidence, so stale or unrelated indexed texts never reach the report
     add_texts(all_texts, metadatas={"query": query})
-    relevant_texts = similarity_search(query, k=10)
+    return similarity_search_texts(query, all_texts, k=k)
+
+# -------------------------------
+# Perform Full Deep Research
+# -------------------------------
+def _with_market_data(report, stock_data):
+    if not stock_data:
+        return report
+    return f"{report}\n\n**Latest Market Data:**\n{stock_data}"
+
+def perform_deep_research(query, plan):
+    """
+    Build the report for query incrementally against its stored report.
+    Serves the stored report when no evidence changed, or when the fetch lost
+    most of it; otherwise only the sections whose evidence changed are regenerated.
+    The live stock snapshot changes on almost every run, so it is kept out of
+    change detection and report generation; fresh quotes are appended to
+    every report instead, so a stored report never shows stale prices.
+    Returns (report, urls, status).
+    """
+    cached = load_report(query)
+    evidence, urls = collect_evidence(query)
+    stock_data = fetch_stock_data(query)
+
+    previous_count = len(cached.get("evidence", {})) if cached else 0
+    if cached and len(evidence) < previous_count * MIN_EVIDENCE_RATIO:
+        # keep the stored report (and its record) rather than rebuilding from a failed fetch
+        report = _with_market_data(cached["report"], stock_data)
+        status = f"Fetched only {len(evidence)} of {previous_count} known sources; served the stored report."
+        return report, cached["urls"], status
+
+    changed, removed = changed_evidence(cached, evidence)
+    if cached and not changed and not removed:
+        report = _with_market_data(cached["report"], stock_data)
+        return report, cached["urls"], "No source changes since the last run; served the stored report."
+
+    relevant_texts = retrieve_relevant_texts(query, evidence)
+
+    previous_sections = cached.get("sections", {}) if cached else {}
+    context_hash = text_hash("\x1f".join([plan] + relevant_texts))
+    report_reused = bool(cached) and cached.get("context_hash") == context_hash
+    if report_reused:
+        report, sections = cached["report"], previous_sections
+    else:
+        prime_summary_cache(previous_sections)
+        sections, generated = {}, set()
+        report = generate_detailed_report(relevant_texts, query, plan=plan, sections=sections, generated=generated)
+
+    save_report(query, {
+        "plan": plan,
+        "evidence": evidence_map(evidence),
+        "context_hash": context_hash,
+        "sections": sections,
+        "report": report,
+        "urls": urls,
+    })
 
-    return relevant_texts, all_urls
+    report_with_quotes = _with_market_data(report, stock_data)
+    if not cached:
+        return report_with_quotes, urls, "Built a new report."
+    status = f"{len(changed)} new or changed and {len(removed)} removed sources; "
+    if report_reused:
+        status += "none affect the report, served the stored report."
+    elif sections:
+        status += f"regenerated {len(generated)} of {len(sections)} sections."
+    else:
+        status += "regenerated the report."
+    return report_with_quotes, urls, status